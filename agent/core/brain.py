@@ -1,124 +1,461 @@
-from typing import Dict, List
-from openai import OpenAI
+import asyncio
+import logging
+import re
+import threading
+import httpx
+from functools import lru_cache, wraps
+from typing import TYPE_CHECKING, Dict, List, Tuple
 import os
 from dotenv import load_dotenv
-from agent.data.prompts import *
-from agent.models.models import *
-from tenacity import retry, stop_after_attempt, wait_exponential
-import json
-from pydantic import ValidationError
-from pprint import pprint
+from agent.data.prompts import (
+    AGENT_RECOMMENDATION_PROMPT,
+    PLANNING_PROMPT,
+    ANALYSIS_PROMPT,
+)
+from agent.models.models import Plan, TrafficScenario, SignalTiming
+import msgspec
 
 
+from agent.core.cache import ResponseCache
 from agent.core.knowledge_base import TrafficKnowledgeBase
 from agent.exceptions.exceptions import PlanningError, AnalysisError
-from agent.tools.tools import (
-    create_traffic_plan,
-    select_best_plan,
-    create_signal_timing,
-    verify_plan_coverage,
-)
+from agent.tools.tools import VALIDATORS, get_tool_schema
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+_API_KEY = os.getenv("OPENAI_API_KEY")
+
+_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# Event loops the sync wrappers run on, one per thread
+_THREAD_LOOPS = threading.local()
+
+
+def _thread_loop() -> asyncio.AbstractEventLoop:
+    """Get the calling thread's event loop for the sync wrappers
+
+    The loop is kept between calls so pooled connections and background
+    tasks survive from one sync call to the next.
+    """
+    loop = getattr(_THREAD_LOOPS, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _THREAD_LOOPS.loop = asyncio.new_event_loop()
+    return loop
+
+
+# The openai SDK dominates import time, so its names are imported where they
+# are first needed rather than with this module
+
+
+def _api_error() -> type:
+    """The SDK's APIError, for except clauses that let API failures through"""
+    from openai import APIError
+
+    return APIError
+
+
+def _new_async_client() -> "AsyncOpenAI":
+    """Build an OpenAI client with its own pool of HTTP/2 connections"""
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=_API_KEY,
+        http_client=httpx.AsyncClient(http2=True, timeout=_TIMEOUT, limits=_LIMITS),
+        max_retries=3,
+        timeout=_TIMEOUT,
+    )
+
+
+def _retry_invalid_output(fn):
+    """Retry a coroutine method when the model output is unusable
+
+    Transport failures are retried by the OpenAI client itself, with backoff
+    that honours Retry-After. The tenacity wrapper is built on first call so
+    tenacity is not imported with this module.
+    """
+    retrying = None
+
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        nonlocal retrying
+        if retrying is None:
+            from tenacity import (
+                retry,
+                retry_if_exception_type,
+                stop_after_attempt,
+                wait_exponential,
+            )
+
+            retrying = retry(
+                retry=retry_if_exception_type((PlanningError, AnalysisError)),
+                stop=stop_after_attempt(3),
+                wait=wait_exponential(min=1, max=10),
+                reraise=True,
+            )(fn)
+        return await retrying(*args, **kwargs)
+
+    return wrapper
+
+
+_SELECTED_INDEX = re.compile(r'"selected_index"\s*:\s*(-?\d+)\s*[,}]')
+
+# Template formatters are bound once instead of looked up on every request
+_format_recommendation_prompt = AGENT_RECOMMENDATION_PROMPT.format
+_format_plan_prompt = PLANNING_PROMPT["user_template"].format
+_format_select_prompt = PLANNING_PROMPT["select_best_plan_prompt"].format
+_format_batch_plan_prompt = PLANNING_PROMPT["batch_user_template"].format
+_format_batch_select_prompt = PLANNING_PROMPT["batch_select_best_plans_prompt"].format
+_format_analysis_prompt = ANALYSIS_PROMPT["user_template"].format
+
+_SCENARIO_TEMPLATE = "Intersection Type: {}\nLanes: {}\nPeak Traffic Volumes: {}\nSpecial Conditions: {}\nTime of Day: {}".format
+
+
+def _format_items(items) -> str:
+    return "\n".join(f"- {k}: {v}" for k, v in items)
+
+
+async def _read_selected_index(stream) -> int:
+    """Read the selected plan index from a streamed function call
+
+    The stream is closed as soon as the index has been received, without
+    waiting for the rest of the arguments.
+    """
+    arguments = ""
+    try:
+        async for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.function_call:
+                continue
+            arguments += chunk.choices[0].delta.function_call.arguments or ""
+            match = _SELECTED_INDEX.search(arguments)
+            if match:
+                return int(match.group(1))
+    finally:
+        await stream.close()
+    return VALIDATORS["select_plan"].decode(arguments).selected_index
+
+
+def _distinct_plans(plans: List[Plan]) -> List[Plan]:
+    """Drop duplicate plans and plans outside the planning prompt's size limits
+
+    If no plan is within the limits, all of them are kept for deduplication.
+    """
+    in_spec = [
+        plan
+        for plan in plans
+        if 2 <= len(plan.challenges) <= 4
+        and 3 <= len(plan.factors) <= 5
+        and 4 <= len(plan.steps) <= 6
+    ]
+    seen = set()
+    distinct = []
+    for plan in in_spec or plans:
+        signature = (
+            tuple(sorted(plan.challenges)),
+            tuple(sorted(plan.factors)),
+            tuple(sorted(plan.steps)),
+        )
+        if signature not in seen:
+            seen.add(signature)
+            distinct.append(plan)
+    return distinct
+
+
+@lru_cache(maxsize=64)
+def _compile_timing_validator(intersection_type: str):
+    """Build a phase timing validator for an intersection type
+
+    The minimum green time is looked up once and bound into the returned
+    function, which checks the phases in a single pass and returns the
+    north-south and east-west timings.
+    """
+    min_green = TrafficKnowledgeBase.get_minimum_green_time(intersection_type)
+
+    def validate(phase_timings: Dict[str, int], cycle_length: int) -> Tuple[int, int]:
+        # Validate minimum timings while summing the phases
+        total_phase_time = 0
+        ns_time = ew_time = None
+        for direction, time in phase_timings.items():
+            if time < min_green:
+                raise AnalysisError(
+                    f"Phase timing for {direction} is below minimum safe time ({min_green} seconds)"
+                )
+            total_phase_time += time
+            if direction == "north-south":
+                ns_time = time
+            elif direction == "east-west":
+                ew_time = time
+
+        # Check that phase timings cover the main directions
+        if ns_time is None or ew_time is None:
+            raise AnalysisError("Missing required phase timings for main directions")
+
+        # Validate cycle length matches phase timings
+        if total_phase_time != cycle_length:
+            raise AnalysisError(
+                f"Cycle length ({cycle_length}) doesn't match sum of phase timings ({total_phase_time})"
+            )
+
+        # Standard cycle length bounds
+        if cycle_length < 60 or cycle_length > 180:
+            raise AnalysisError(
+                f"Cycle length {cycle_length} outside acceptable range (60-180 seconds)"
+            )
+
+        return ns_time, ew_time
+
+    return validate
+
+
+@lru_cache(maxsize=256)
+def _format_scenario_fields(
+    intersection_type: str,
+    lanes: tuple,
+    peak_traffic: tuple,
+    special_conditions: tuple,
+    time_of_day: str,
+) -> str:
+    """Format hashable scenario fields, memoized across repeated scenarios"""
+    return _SCENARIO_TEMPLATE(
+        intersection_type,
+        _format_items(lanes),
+        _format_items(peak_traffic),
+        ", ".join(special_conditions),
+        time_of_day,
+    )
+
+
+@lru_cache(maxsize=256)
+def _format_recommendation_fields(
+    intersection_type: str,
+    lanes: tuple,
+    peak_traffic: tuple,
+    special_conditions: tuple,
+    time_of_day: str,
+) -> str:
+    """Format the recommendation prompt from hashable scenario fields"""
+    return _format_recommendation_prompt(
+        intersection_type=intersection_type,
+        lanes=_format_items(lanes),
+        peak_traffic=_format_items(peak_traffic),
+        special_conditions=", ".join(special_conditions),
+        time_of_day=time_of_day,
+    )
+
 
 class TrafficAgent:
     def __init__(self):
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Clients are built lazily, so report a missing key up front as the
+        # SDK would on construction
+        if not _API_KEY:
+            from openai import OpenAIError
+
+            raise OpenAIError(
+                "The api_key client option must be set either by passing api_key to the client or by setting the OPENAI_API_KEY environment variable"
+            )
+        # Pooled connections are bound to the event loop that opened them, so
+        # each loop gets its own client, closed by aclose
+        self._async_clients = {}
+        self._pinned_client = None
         self.context_history = []
+        self._cache = ResponseCache()
+        self._pending_verifications = []
+        # Function lists are built once and passed to every request as-is
+        self._plan_tools = [get_tool_schema("create_traffic_plan")]
+        self._select_tools = [get_tool_schema("select_plan")]
+        self._timing_tools = [get_tool_schema("create_signal_timing")]
+        self._verify_tools = [get_tool_schema("verify_plan_coverage")]
+        self._batch_plan_tools = [get_tool_schema("create_traffic_plans")]
+        self._batch_select_tools = [get_tool_schema("select_plans")]
+
+    @property
+    def async_client(self) -> "AsyncOpenAI":
+        """The OpenAI client for the running event loop
+
+        Assigning a client pins it for every loop, e.g. a fake one in tests.
+        """
+        if self._pinned_client is not None:
+            return self._pinned_client
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            self._drop_closed_loops()
+            client = self._async_clients[loop] = _new_async_client()
+        return client
+
+    @async_client.setter
+    def async_client(self, client) -> None:
+        self._pinned_client = client
+
+    def _drop_closed_loops(self) -> None:
+        """Forget clients whose event loop has closed
+
+        Their connections can no longer be closed gracefully, so dropping
+        them at least lets the sockets be reclaimed.
+        """
+        for loop in [loop for loop in self._async_clients if loop.is_closed()]:
+            del self._async_clients[loop]
+
+    async def aclose(self) -> None:
+        """Close the running event loop's client and its pooled connections
+
+        Callers that start a new event loop per request, e.g. with
+        asyncio.run, should close the agent before the loop ends, or use it
+        as an async context manager.
+        """
+        self._drop_closed_loops()
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def close(self) -> None:
+        """Close the client the sync methods use on this thread"""
+        self._run(self.aclose())
+
+    async def __aenter__(self) -> "TrafficAgent":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def _run(self, coro):
+        """Run a coroutine to completion on the calling thread's event loop"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return _thread_loop().run_until_complete(coro)
+        coro.close()
+        raise RuntimeError(
+            "TrafficAgent's sync methods cannot be called from a running event "
+            "loop; await the matching *_async method instead"
+        )
 
     def _generate_prompt(self, scenario: TrafficScenario) -> str:
         """Generate a detailed prompt for the LLM"""
-        prompt = AGENT_RECOMMENDATION_PROMPT.format(
-            intersection_type=scenario.intersection_type,
-            lanes=self._format_dict(scenario.lanes),
-            peak_traffic=self._format_dict(scenario.peak_traffic),
-            special_conditions=", ".join(scenario.special_conditions),
-            time_of_day=scenario.time_of_day,
-        )
+        prompt = _format_recommendation_fields(*scenario.fields_key)
         return prompt
 
     def _generate_plan_prompt(self, scenario: TrafficScenario) -> str:
         """Generate a prompt for the plan creation"""
         formatted_scenario = self._format_scenario(scenario)
-        prompt = PLANNING_PROMPT["user_template"].format(scenario=formatted_scenario)
+        prompt = _format_plan_prompt(scenario=formatted_scenario)
         return prompt
 
     def _format_scenario(self, scenario: TrafficScenario) -> str:
         """Format the scenario for the prompt"""
-        return f"Intersection Type: {scenario.intersection_type}\nLanes: {self._format_dict(scenario.lanes)}\nPeak Traffic Volumes: {self._format_dict(scenario.peak_traffic)}\nSpecial Conditions: {', '.join(scenario.special_conditions)}\nTime of Day: {scenario.time_of_day}"
+        return _format_scenario_fields(*scenario.fields_key)
+
+    @_retry_invalid_output
+    async def _create_single_plan_async(
+        self, scenario: TrafficScenario, slot: int = 0
+    ) -> Plan:
+        """Create a single plan with error handling and function calling
+
+        Each candidate slot is cached separately so repeated scenarios keep
+        their set of distinct plans.
+        """
+        cache_key = self._cache.key("plan", scenario, slot)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
-    def _create_single_plan(self, scenario: TrafficScenario) -> Plan:
-        """Create a single plan with error handling and function calling"""
         try:
-            response = self.openai_client.chat.completions.create(
+            response = await self.async_client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": PLANNING_PROMPT["system_message"]},
                     {"role": "user", "content": self._generate_plan_prompt(scenario)},
                 ],
-                functions=[create_traffic_plan],
-                function_call={"name": create_traffic_plan["name"]},
+                functions=self._plan_tools,
+                function_call={"name": "create_traffic_plan"},
             )
 
-            # Parse the function call response
-            function_args = json.loads(
+            # Parse and validate the function call response in one pass
+            plan = VALIDATORS["create_traffic_plan"].decode(
                 response.choices[0].message.function_call.arguments
             )
-            return Plan(**function_args)
+            self._cache.set(cache_key, plan)
+            return plan
 
-        except json.JSONDecodeError as e:
-            raise PlanningError(f"Failed to parse LLM response: {e}")
-        except ValidationError as e:
+        except _api_error():
+            raise
+        except msgspec.ValidationError as e:
             raise PlanningError(f"Invalid plan structure: {e}")
+        except msgspec.DecodeError as e:
+            raise PlanningError(f"Failed to parse LLM response: {e}")
         except Exception as e:
             raise PlanningError(f"Unexpected error in plan creation: {e}")
 
-    def _create_plan(self, scenario: TrafficScenario) -> Plan:
-        """Create and select the best plan from multiple attempts"""
-        try:
-            # Generate three plans
-            plans = []
-            for _ in range(3):
-                plan = self._create_single_plan(scenario)
-                plans.append(plan)
+    async def _create_plans_async(
+        self, scenario: TrafficScenario, count: int = 3
+    ) -> List[Plan]:
+        """Generate candidate plans concurrently, dropping any that failed"""
+        results = await asyncio.gather(
+            *(self._create_single_plan_async(scenario, slot) for slot in range(count)),
+            return_exceptions=True,
+        )
+        return [plan for plan in results if isinstance(plan, Plan)]
 
-            # Select the best plan
-            best_plan = self._select_best_plan(plans, scenario)
-            return best_plan
+    def _create_plans(self, scenario: TrafficScenario, count: int = 3) -> List[Plan]:
+        """Generate candidate plans concurrently, dropping any that failed"""
+        return self._run(self._create_plans_async(scenario, count))
 
-        except PlanningError as e:
-            # If we have at least one valid plan, use it instead of failing
-            if plans:
-                return plans[0]
+    async def _pick_plan_async(
+        self, plans: List[Plan], scenario: TrafficScenario
+    ) -> Plan:
+        """Select the best of the candidate plans, falling back to the first"""
+        if not plans:
             raise PlanningError("Failed to create any valid plans")
 
-    def _select_best_plan(self, plans: List[str], scenario: TrafficScenario) -> str:
+        # Skip the selection request when only one plan is worth comparing
+        plans = _distinct_plans(plans)
+        if len(plans) == 1:
+            return plans[0]
+
+        try:
+            return await self._select_best_plan_async(plans, scenario)
+        except PlanningError:
+            # If we have at least one valid plan, use it instead of failing
+            return plans[0]
+
+    async def _create_plan_async(self, scenario: TrafficScenario) -> Plan:
+        """Create and select the best plan from multiple attempts"""
+        plans = await self._create_plans_async(scenario)
+        return await self._pick_plan_async(plans, scenario)
+
+    def _create_plan(self, scenario: TrafficScenario) -> Plan:
+        """Create and select the best plan from multiple attempts"""
+        return self._run(self._create_plan_async(scenario))
+
+    async def _select_best_plan_async(
+        self, plans: List[Plan], scenario: TrafficScenario
+    ) -> Plan:
         """Select the best plan using function calling for strict output"""
         try:
             plans_str = "\n\n".join(
-                [
-                    f"Plan {i+1}:\n" + plan.model_dump_json(indent=2)
-                    for i, plan in enumerate(plans)
-                ]
+                [f"Plan {i}:\n" + plan.compact_json for i, plan in enumerate(plans)]
             )
-            response = self.openai_client.chat.completions.create(
+            stream = await self.async_client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {
                         "role": "user",
-                        "content": PLANNING_PROMPT["select_best_plan_prompt"].format(
+                        "content": _format_select_prompt(
                             scenario=self._format_scenario(scenario), plans=plans_str
                         ),
                     }
                 ],
-                functions=[select_best_plan],
-                function_call={"name": select_best_plan["name"]},
+                functions=self._select_tools,
+                function_call={"name": "select_plan"},
+                stream=True,
             )
-            selection = json.loads(response.choices[0].message.function_call.arguments)
-            index = selection["selected_index"]
+            index = await _read_selected_index(stream)
 
             # Validate index
             if not 0 <= index < len(plans):
@@ -126,142 +463,122 @@ class TrafficAgent:
 
             return plans[index]
 
-        except (json.JSONDecodeError, KeyError, IndexError) as e:
+        except msgspec.DecodeError:
             # If selection fails, return the first plan
             return plans[0]
         except Exception as e:
             raise PlanningError(f"Error in plan selection: {e}")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
-    def analyze_with_plan(self, scenario: TrafficScenario, plan: Plan) -> SignalTiming:
-        """Analyze a traffic scenario with a given plan"""
+    @_retry_invalid_output
+    async def analyze_with_plan_async(
+        self, scenario: TrafficScenario, plan: Plan, strict: bool = True
+    ) -> SignalTiming:
+        """Analyze a traffic scenario with a given plan
+
+        With strict=False the timing is returned before the plan coverage
+        verification finishes; the verification keeps running in the
+        background and its outcome is collected by drain_verifications.
+        """
+        cache_key = self._cache.key("analysis", scenario, plan)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            response = self.openai_client.chat.completions.create(
+            response = await self.async_client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": ANALYSIS_PROMPT["system_message"]},
                     {
                         "role": "user",
-                        "content": ANALYSIS_PROMPT["user_template"].format(
+                        "content": _format_analysis_prompt(
                             scenario=self._format_scenario(scenario),
-                            plan=plan.model_dump_json(indent=2),
+                            min_green=TrafficKnowledgeBase.get_minimum_green_time(
+                                scenario.intersection_type
+                            ),
+                            plan=plan.compact_json,
                         ),
                     },
                 ],
-                functions=[create_signal_timing],
-                function_call={"name": create_signal_timing["name"]},
+                functions=self._timing_tools,
+                function_call={"name": "create_signal_timing"},
             )
 
-            # print("\n=== Mock Response ===")
-            # pprint(response.choices[0].message.function_call.arguments)
-
-            function_args = json.loads(
+            timing = VALIDATORS["create_signal_timing"].decode(
                 response.choices[0].message.function_call.arguments
             )
 
-            # print("\n=== Parsed Arguments ===")
-            # pprint(function_args)
-            print("\n=== DEBUG ===")
-            print("Type of function_args:", type(function_args))
-            print("Keys in function_args:", function_args.keys())
-            print("Full function_args:")
-            pprint(function_args)
-            print("=============\n")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Timing function arguments: %r", timing)
 
             # Validate completeness and correctness
-            self._validate_timing_logic(function_args, scenario)
-
-            # Validate the recommendations
-            timing = self._validate_timing_recommendations(function_args, plan)
+            self._validate_timing(timing, scenario)
+            if not strict:
+                self._pending_verifications.append(
+                    asyncio.ensure_future(
+                        self._verify_and_cache_async(timing, plan, cache_key)
+                    )
+                )
+                return timing
 
+            await self._verify_and_cache_async(timing, plan, cache_key)
             return timing
 
-        except json.JSONDecodeError as e:
-            raise AnalysisError(f"Failed to parse LLM response: {e}")
-        except ValidationError as e:
+        except _api_error():
+            raise
+        except msgspec.ValidationError as e:
             raise AnalysisError(f"Invalid timing structure: {e}")
+        except msgspec.DecodeError as e:
+            raise AnalysisError(f"Failed to parse LLM response: {e}")
         except Exception as e:
             raise AnalysisError(f"Unexpected error in analysis: {e}")
 
-    def _validate_timing_logic(
-        self, timing_dict: Dict, scenario: TrafficScenario
-    ) -> None:
-        """Validate that the timing recommendations make logical sense"""
-
-        # Check that phase timings exist and cover all directions
-        if "phase_timings" not in timing_dict:
-            raise AnalysisError("No phase timings provided")
+    def analyze_with_plan(
+        self, scenario: TrafficScenario, plan: Plan, strict: bool = True
+    ) -> SignalTiming:
+        """Analyze a traffic scenario with a given plan
 
-        phase_timings = timing_dict["phase_timings"]
-        if not {"north-south", "east-west"}.issubset(phase_timings.keys()):
-            raise AnalysisError("Missing required phase timings for main directions")
+        With strict=False the background verification only makes progress
+        while this thread's event loop runs, that is during later sync calls
+        such as drain_verifications.
+        """
+        return self._run(self.analyze_with_plan_async(scenario, plan, strict))
 
-        # Validate cycle length matches phase timings
-        total_phase_time = sum(phase_timings.values())
-        if total_phase_time != timing_dict["cycle_length"]:
-            raise AnalysisError(
-                f"Cycle length ({timing_dict['cycle_length']}) doesn't match sum of phase timings ({total_phase_time})"
-            )
+    async def _verify_and_cache_async(
+        self, timing: SignalTiming, plan: Plan, cache_key: str
+    ) -> None:
+        """Verify the timing against the plan and cache it once verified"""
+        await self._verify_plan_addressed_async(timing, plan)
+        self._cache.set(cache_key, timing)
+
+    async def drain_verifications_async(self) -> None:
+        """Wait for background verifications, raising the first failure"""
+        pending, self._pending_verifications = self._pending_verifications, []
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    def drain_verifications(self) -> None:
+        """Wait for background verifications, raising the first failure"""
+        self._run(self.drain_verifications_async())
+
+    def _validate_timing(self, timing: SignalTiming, scenario: TrafficScenario) -> None:
+        """Validate that the timing recommendations make logical sense"""
+        validate_phases = _compile_timing_validator(scenario.intersection_type)
+        ns_time, ew_time = validate_phases(timing.phase_timings, timing.cycle_length)
 
         # Check that busier approaches get more green time
-        ns_volume = max(
-            scenario.peak_traffic.get("north", 0), scenario.peak_traffic.get("south", 0)
-        )
-        ew_volume = max(
-            scenario.peak_traffic.get("east", 0), scenario.peak_traffic.get("west", 0)
-        )
-        if (
-            ns_volume > ew_volume
-            and phase_timings["north-south"] <= phase_timings["east-west"]
-        ):
+        ns_volume, ew_volume = scenario.axis_peaks
+        if ns_volume > ew_volume and ns_time <= ew_time:
             raise AnalysisError(
                 "Phase timings don't properly account for traffic volumes"
             )
 
-        # Validate minimum and maximum timings
-        for direction, time in phase_timings.items():
-            if time < 15:
-                raise AnalysisError(
-                    f"Phase timing for {direction} is below minimum safe time"
-                )
-
-        if timing_dict["cycle_length"] > 180:
-            raise AnalysisError("Cycle length exceeds maximum recommended duration")
-
-    def _validate_timing_recommendations(
-        self, timing_dict: Dict, plan: Plan
-    ) -> SignalTiming:
-        """Validate the timing recommendations"""
-        timing = SignalTiming(**timing_dict)
-
-        self._check_minimum_timings(timing)
-        self._verify_plan_addressed(timing, plan)
-
-        return timing
-
-    def _check_minimum_timings(self, timing: SignalTiming):
-        """Check that all timings meet minimum safety requirements"""
-        for phase, time in timing.phase_timings.items():
-            if time < 15:  # Example minimum green time
-                raise AnalysisError(
-                    f"Phase {phase} timing too short: minimum 15 seconds required"
-                )
-
-        if (
-            timing.cycle_length < 60 or timing.cycle_length > 180
-        ):  # Standard cycle length bounds
-            raise AnalysisError(
-                f"Cycle length {timing.cycle_length} outside acceptable range (60-180 seconds)"
-            )
-
-    def _verify_plan_addressed(self, timing: SignalTiming, plan: Plan) -> None:
-        """
-        Verify that the timing recommendations address all aspects of the plan
-        using LLM to evaluate comprehensiveness and correctness
-        """
-        verification_prompt = {
-            "role": "user",
-            "content": f"""
+    def _build_verification_content(self, plan: Plan, timing: SignalTiming) -> str:
+        """Build the verification prompt for a plan and its timing recommendations"""
+        turn_str = timing.turn_signal_timings or "None"
+        return f"""
             Analyze whether these signal timing recommendations properly address the analysis plan.
             
             PLAN:
@@ -271,15 +588,32 @@ class TrafficAgent:
 
             TIMING RECOMMENDATIONS:
             Phase Timings: {timing.phase_timings}
-            Turn Signal Timings: {timing.turn_signal_timings if timing.turn_signal_timings else 'None'}
+            Turn Signal Timings: {turn_str}
             Cycle Length: {timing.cycle_length}
             Priority Phases: {timing.priority_phases}
             Reasoning: {timing.reasoning}
-            """,
+            """
+
+    async def _verify_plan_addressed_async(
+        self, timing: SignalTiming, plan: Plan
+    ) -> None:
+        """
+        Verify that the timing recommendations address all aspects of the plan
+        using LLM to evaluate comprehensiveness and correctness
+        """
+        cache_key = self._cache.key("verification", plan, timing)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self.last_verification = cached
+            return
+
+        verification_prompt = {
+            "role": "user",
+            "content": self._build_verification_content(plan, timing),
         }
 
         try:
-            response = self.openai_client.chat.completions.create(
+            response = await self.async_client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -288,24 +622,27 @@ class TrafficAgent:
                     },
                     verification_prompt,
                 ],
-                functions=[verify_plan_coverage],
-                function_call={"name": verify_plan_coverage["name"]},
+                functions=self._verify_tools,
+                function_call={"name": "verify_plan_coverage"},
             )
 
             # Parse the verification results
-            results = json.loads(response.choices[0].message.function_call.arguments)
+            results = VALIDATORS["verify_plan_coverage"].decode(
+                response.choices[0].message.function_call.arguments
+            )
 
             # Check if any critical elements were missed
             critical_misses = [
                 v
-                for v in results["verifications"]
-                if not v["is_addressed"] and v["confidence"] > 0.8
+                for v in results.verifications
+                if not v.is_addressed and v.confidence > 0.8
             ]
 
             # If there are critical misses or the overall assessment is insufficient
-            if critical_misses or not results["overall_assessment"]["is_sufficient"]:
-                missing = results["overall_assessment"]["missing_elements"]
-                recommendations = results["overall_assessment"]["recommendations"]
+            assessment = results.overall_assessment
+            if critical_misses or not assessment.is_sufficient:
+                missing = assessment.missing_elements
+                recommendations = assessment.recommendations
 
                 raise AnalysisError(
                     f"Timing recommendations incomplete.\n"
@@ -315,20 +652,56 @@ class TrafficAgent:
 
             # Store verification results for potential later use
             self.last_verification = results
+            self._cache.set(cache_key, results)
 
+        except _api_error():
+            raise
         except Exception as e:
             raise AnalysisError(f"Error in plan verification: {str(e)}")
 
-    # Update the main analyze_scenario method to use the new planning and analysis
-    def analyze_scenario(self, scenario: TrafficScenario) -> SignalTiming:
-        """Analyze a traffic scenario and provide signal timing recommendations"""
+    async def analyze_scenario_async(self, scenario: TrafficScenario) -> SignalTiming:
+        """Analyze a traffic scenario and provide signal timing recommendations
+
+        Analysis is started speculatively on the first plan to arrive, so when
+        the selection step picks that plan its round-trip is already underway.
+        Completed analyses are cached per scenario, so a repeated scenario also
+        skips the plan selection request.
+        """
+        cache_key = self._cache.key("scenario", scenario)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        plan_tasks = [
+            asyncio.ensure_future(self._create_single_plan_async(scenario, slot))
+            for slot in range(3)
+        ]
+        plans = []
+        speculative_plan = None
+        speculative = None
         try:
+            for next_plan in asyncio.as_completed(plan_tasks):
+                try:
+                    plans.append(await next_plan)
+                except Exception:
+                    continue
+                if speculative is None:
+                    speculative_plan = plans[0]
+                    speculative = asyncio.ensure_future(
+                        self.analyze_with_plan_async(scenario, speculative_plan)
+                    )
+
             # Create and select the best plan
-            plan = self._create_plan(scenario)
+            plan = await self._pick_plan_async(plans, scenario)
 
             # Generate recommendations based on the plan
-            timing = self.analyze_with_plan(scenario, plan)
-
+            if plan is speculative_plan:
+                timing = await speculative
+            else:
+                speculative.cancel()
+                await asyncio.gather(speculative, return_exceptions=True)
+                timing = await self.analyze_with_plan_async(scenario, plan)
+            self._cache.set(cache_key, timing)
             return timing
 
         except (PlanningError, AnalysisError) as e:
@@ -336,6 +709,156 @@ class TrafficAgent:
             print(f"Error in full analysis: {e}")
             return self._fallback_analysis(scenario)
 
+    def analyze_scenario(self, scenario: TrafficScenario) -> SignalTiming:
+        """Analyze a traffic scenario and provide signal timing recommendations"""
+        return self._run(self.analyze_scenario_async(scenario))
+
+    def _format_scenarios(self, scenarios: List[TrafficScenario]) -> str:
+        """Format several scenarios as a numbered block for batched prompts"""
+        return "\n\n".join(
+            f"Scenario {i}:\n{self._format_scenario(scenario)}"
+            for i, scenario in enumerate(scenarios)
+        )
+
+    async def _create_plans_batch_async(
+        self, scenarios: List[TrafficScenario]
+    ) -> List[List[Plan]]:
+        """Create candidate plans for every scenario in a single request"""
+        try:
+            response = await self.async_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": PLANNING_PROMPT["system_message"]},
+                    {
+                        "role": "user",
+                        "content": _format_batch_plan_prompt(
+                            scenarios=self._format_scenarios(scenarios)
+                        ),
+                    },
+                ],
+                functions=self._batch_plan_tools,
+                function_call={"name": "create_traffic_plans"},
+            )
+            batch = VALIDATORS["create_traffic_plans"].decode(
+                response.choices[0].message.function_call.arguments
+            )
+        except msgspec.DecodeError:
+            # Invalid or truncated output leaves every scenario to the
+            # single-scenario plan path
+            return [[] for _ in scenarios]
+        except Exception as e:
+            raise PlanningError(f"Unexpected error in plan creation: {e}")
+
+        # Group the returned plans by scenario, skipping unknown indices
+        plans = [[] for _ in scenarios]
+        for entry in batch.plans:
+            if 0 <= entry.scenario_index < len(scenarios):
+                plans[entry.scenario_index].append(
+                    Plan(entry.challenges, entry.factors, entry.steps)
+                )
+        return plans
+
+    async def _select_best_plans_batch_async(
+        self, scenarios: List[TrafficScenario], plans: List[List[Plan]]
+    ) -> List[Plan]:
+        """Select the best plan for every scenario in a single request"""
+        plans = [_distinct_plans(candidates) for candidates in plans]
+
+        # Default to the first plan wherever the selection is missing
+        selected = [candidates[0] for candidates in plans]
+
+        # Only scenarios left with a choice between plans need selecting
+        blocks = []
+        for i, (scenario, candidates) in enumerate(zip(scenarios, plans)):
+            if len(candidates) < 2:
+                continue
+            plans_str = "\n\n".join(
+                f"Plan {j}:\n" + plan.compact_json for j, plan in enumerate(candidates)
+            )
+            blocks.append(
+                f"Scenario {i}:\n{self._format_scenario(scenario)}\n\n{plans_str}"
+            )
+        if not blocks:
+            return selected
+
+        try:
+            response = await self.async_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {
+                        "role": "user",
+                        "content": _format_batch_select_prompt(
+                            scenarios="\n\n".join(blocks)
+                        ),
+                    }
+                ],
+                functions=self._batch_select_tools,
+                function_call={"name": "select_plans"},
+            )
+            selection = VALIDATORS["select_plans"].decode(
+                response.choices[0].message.function_call.arguments
+            )
+            for entry in selection.selections:
+                i, index = entry.scenario_index, entry.selected_index
+                if 0 <= i < len(plans) and 0 <= index < len(plans[i]):
+                    selected[i] = plans[i][index]
+
+        except msgspec.DecodeError:
+            pass
+        except Exception as e:
+            raise PlanningError(f"Error in plan selection: {e}")
+
+        return selected
+
+    async def analyze_scenarios_async(
+        self, scenarios: List[TrafficScenario]
+    ) -> List[SignalTiming]:
+        """Analyze several traffic scenarios, batching the planning requests
+
+        Plan creation and plan selection each cost one request for the whole
+        batch; analysis then runs concurrently per scenario, each falling back
+        on its own.
+        """
+        if not scenarios:
+            return []
+
+        plans = await self._create_plans_batch_async(scenarios)
+
+        # Scenarios the batch produced no plans for go through the single path
+        missing = [i for i, candidates in enumerate(plans) if not candidates]
+        if missing:
+            fallbacks = await asyncio.gather(
+                *(self._create_plans_async(scenarios[i]) for i in missing)
+            )
+            for i, candidates in zip(missing, fallbacks):
+                if not candidates:
+                    raise PlanningError("Failed to create any valid plans")
+                plans[i] = candidates
+
+        selected = await self._select_best_plans_batch_async(scenarios, plans)
+        return list(
+            await asyncio.gather(
+                *(
+                    self._analyze_selected_async(scenario, plan)
+                    for scenario, plan in zip(scenarios, selected)
+                )
+            )
+        )
+
+    async def _analyze_selected_async(
+        self, scenario: TrafficScenario, plan: Plan
+    ) -> SignalTiming:
+        """Analyze a scenario with its selected plan, falling back on failure"""
+        try:
+            return await self.analyze_with_plan_async(scenario, plan)
+        except AnalysisError as e:
+            print(f"Error in full analysis: {e}")
+            return self._fallback_analysis(scenario)
+
+    def analyze_scenarios(self, scenarios: List[TrafficScenario]) -> List[SignalTiming]:
+        """Analyze several traffic scenarios, batching the planning requests"""
+        return self._run(self.analyze_scenarios_async(scenarios))
+
     def _fallback_analysis(self, scenario: TrafficScenario) -> SignalTiming:
         """Simplified analysis when the full process fails"""
         # Implementation of a simpler, more robust analysis method
@@ -348,4 +871,30 @@ class TrafficAgent:
         return timing.reasoning
 
     def _format_dict(self, d: Dict) -> str:
-        return "\n".join([f"- {k}: {v}" for k, v in d.items()])
+        return _format_items(d.items())
+
+
+def _warmup() -> None:
+    """Make one API request and exercise the prompt templates
+
+    Pays the SDK import and first connection setup cost at import rather
+    than on the first scenario analyzed.
+    """
+    _format_plan_prompt(scenario="")
+    _format_analysis_prompt(scenario="", plan="", min_green=0)
+
+    async def connect() -> None:
+        client = _new_async_client()
+        try:
+            await client.models.list()
+        finally:
+            await client.close()
+
+    try:
+        _thread_loop().run_until_complete(connect())
+    except Exception as e:
+        logger.warning("Traffic agent warmup request failed: %s", e)
+
+
+if os.getenv("TRAFFIC_AGENT_WARMUP") == "1":
+    _warmup()
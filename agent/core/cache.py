@@ -0,0 +1,59 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Optional
+
+import msgspec
+
+
+class _LRUStore(OrderedDict):
+    """In-memory store evicting the least recently used entry past maxsize"""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+class ResponseCache:
+    """Content-addressed cache for LLM responses
+
+    Entries are kept in memory by default, bounded to the maxsize most recently
+    used. Setting TRAFFIC_AGENT_CACHE to a directory path stores them with
+    diskcache instead, so they survive restarts.
+    """
+
+    def __init__(self, location: Optional[str] = None, maxsize: int = 1024):
+        location = location or os.getenv("TRAFFIC_AGENT_CACHE", ":memory:")
+        if location == ":memory:":
+            self._store = _LRUStore(maxsize)
+        else:
+            from diskcache import Cache
+
+            self._store = Cache(location)
+
+    @staticmethod
+    def key(namespace: str, *parts: Any) -> str:
+        """Build a cache key from the canonical JSON of each part"""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            digest.update(msgspec.json.encode(part, order="sorted"))
+            digest.update(b"\0")
+        return f"{namespace}:{digest.hexdigest()}"
+
+    def get(self, key: str) -> Any:
+        return self._store.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        self._store[key] = value
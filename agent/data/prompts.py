@@ -1,3 +1,5 @@
+from types import MappingProxyType
+
 AGENT_RECOMMENDATION_PROMPT = """You are an expert traffic engineer. Analyze the following intersection scenario and provide optimal signal timing recommendations:
 Intersection Type: {intersection_type}
 Lanes:
@@ -47,15 +49,34 @@ PLANNING_PROMPT = {
 
     Your proposed plan:
     """,
-    "select_best_plan_prompt": """You are an expert traffic engineer. You are given three plans for a traffic scenario and asked to select the best plan. Your selection should be based on the most effective use of resources (time and money) to achieve the best outcomes for the given scenario. This is the scenario:
+    "select_best_plan_prompt": """You are an expert traffic engineer. You are given candidate plans for a traffic scenario and asked to select the best plan. Your selection should be based on the most effective use of resources (time and money) to achieve the best outcomes for the given scenario. This is the scenario:
     {scenario}
 
-    Here are the three plans:
+    Here are the candidate plans:
     {plans}
 
-    Output the index of the best plan. For example, if plan 2 is the best, output "2".
+    Output the index of the best plan. For example, if plan 1 is the best, output "1".
     Your selection:
     """,
+    "batch_user_template": """
+    Given these traffic scenarios, create three different structured analysis plans for each scenario. Each plan should:
+    1. Identify key challenges (2-4 challenges, focus on critical issues that could impact safety or significantly affect flow)
+    2. List main factors to analyze (3-5 factors, must include safety metrics and efficiency metrics)
+    3. Propose analysis steps in order (4-6 steps, each step should build on previous steps)
+
+    Tag every plan with the index of the scenario it was created for.
+
+    Here are the scenarios:
+    {scenarios}
+
+    Your proposed plans:
+    """,
+    "batch_select_best_plans_prompt": """You are an expert traffic engineer. You are given several traffic scenarios, each with candidate plans, and asked to select the best plan for every scenario. Your selection should be based on the most effective use of resources (time and money) to achieve the best outcomes for the given scenario. These are the scenarios and their plans:
+    {scenarios}
+
+    Output the index of the best plan for each scenario index.
+    Your selections:
+    """,
     "example_output": {
         "challenges": [
             "Heavy north-south traffic during peak hours creating long queues",
@@ -86,7 +107,7 @@ ANALYSIS_PROMPT = {
     4. Turn signal timings when needed for safety or efficiency
     
     Your recommendations must follow standard traffic engineering principles:
-    - Minimum green time of 15 seconds per phase
+    - Minimum green time per phase as given for the intersection type
     - Maximum cycle length of 180 seconds
     - Phase timings must sum to the total cycle length
     - Higher-volume approaches should get proportionally more green time""",
@@ -99,6 +120,9 @@ ANALYSIS_PROMPT = {
     ANALYSIS PLAN:
     {plan}
 
+    MINIMUM GREEN TIME:
+    {min_green} seconds per phase
+
     Follow each step in the plan and provide your timing recommendations in the specified JSON format.
     Remember to address each challenge and factor listed in the plan.
     """,
@@ -110,3 +134,7 @@ ANALYSIS_PROMPT = {
         "reasoning": "Detailed explanation of the timing decisions...",
     },
 }
+
+# Read-only views so the shared templates cannot be changed at runtime
+PLANNING_PROMPT = MappingProxyType(PLANNING_PROMPT)
+ANALYSIS_PROMPT = MappingProxyType(ANALYSIS_PROMPT)
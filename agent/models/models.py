@@ -1,36 +1,88 @@
-from pydantic import BaseModel
-from typing import Dict, List, Optional
+from functools import cached_property
+import msgspec
+from typing import Annotated, Dict, List, Optional, Tuple
 
 
-class Plan(BaseModel):
-    challenges: List[str]
-    factors: List[str]
-    steps: List[str]
+class Plan(msgspec.Struct, frozen=True, dict=True):
+    challenges: Annotated[
+        List[str], msgspec.Meta(description="List of 2-4 key challenges")
+    ]
+    factors: Annotated[
+        List[str], msgspec.Meta(description="List of 3-5 main factors to analyze")
+    ]
+    steps: Annotated[
+        List[str], msgspec.Meta(description="List of 4-6 ordered analysis steps")
+    ]
 
+    @cached_property
+    def compact_json(self) -> str:
+        """Compact JSON used in prompts, serialized once per plan"""
+        return msgspec.json.encode(self).decode()
 
-class TrafficScenario(BaseModel):
+
+class TrafficScenario(msgspec.Struct, frozen=True, dict=True):
     """
     Represents a traffic intersection scenario
     """
 
-    intersection_type: str  # e.g., "4-way", "3-way"
-    lanes: Dict[str, int]  # e.g., {"north": 2, "south": 2, "east": 1, "west": 1}
+    intersection_type: Annotated[str, msgspec.Meta(min_length=1)]  # e.g., "4-way"
+    # e.g., {"north": 2, "south": 2, "east": 1, "west": 1}
+    lanes: Annotated[Dict[str, int], msgspec.Meta(min_length=1)]
     peak_traffic: Dict[str, float]  # Traffic volume by direction
     special_conditions: List[str]  # e.g., ["school_nearby", "heavy_pedestrian"]
     time_of_day: str  # e.g., "morning_rush", "midday", "evening_rush"
 
+    def __post_init__(self):
+        # Constraints are only enforced by msgspec when decoding, so repeat
+        # them for scenarios constructed directly
+        if not self.intersection_type:
+            raise msgspec.ValidationError("Intersection type must not be empty")
+        if not self.lanes:
+            raise msgspec.ValidationError("Scenario must define at least one lane")
+
+    @cached_property
+    def fields_key(self) -> tuple:
+        """Hashable view of the fields; dict and list fields become tuples"""
+        return (
+            self.intersection_type,
+            tuple(self.lanes.items()),
+            tuple(self.peak_traffic.items()),
+            tuple(self.special_conditions),
+            self.time_of_day,
+        )
+
+    @cached_property
+    def axis_peaks(self) -> Tuple[float, float]:
+        """Peak traffic volume on the north-south and east-west axes"""
+        return (
+            max(self.peak_traffic.get(d, 0) for d in ("north", "south")),
+            max(self.peak_traffic.get(d, 0) for d in ("east", "west")),
+        )
+
 
-class SignalTiming(BaseModel):
+class SignalTiming(msgspec.Struct, kw_only=True, frozen=True, gc=False):
     """Represents a signal timing recommendation"""
 
-    phase_timings: Dict[str, int]  # e.g., {"north-south": 45, "east-west": 30}
-    turn_signal_timings: Optional[Dict[str, int]] = None
-    cycle_length: int
-    priority_phases: List[str]
-    reasoning: str
+    # e.g., {"north-south": 45, "east-west": 30}
+    phase_timings: Annotated[
+        Dict[str, int], msgspec.Meta(description="Timing in seconds for each phase")
+    ]
+    turn_signal_timings: Annotated[
+        Optional[Dict[str, int]],
+        msgspec.Meta(description="Optional timing in seconds for turn signals"),
+    ] = None
+    cycle_length: Annotated[
+        int, msgspec.Meta(description="Total cycle length in seconds")
+    ]
+    priority_phases: Annotated[
+        List[str], msgspec.Meta(description="List of priority phases")
+    ]
+    reasoning: Annotated[
+        str, msgspec.Meta(description="Detailed explanation of timing decisions")
+    ]
 
 
-class PlanVerification(BaseModel):
+class PlanVerification(msgspec.Struct):
     challenge_addressed: bool
     explanation: str
     confidence: float
@@ -0,0 +1,71 @@
+from typing import Annotated, List, Literal
+
+import msgspec
+
+from agent.models.models import Plan
+
+# create_traffic_plan and create_signal_timing take Plan and SignalTiming as
+# their arguments directly, so only the remaining tools have Structs here
+
+
+class SelectPlanArgs(msgspec.Struct):
+    selected_index: Annotated[
+        int, msgspec.Meta(ge=0, le=2, description="Zero-based index of the best plan")
+    ]
+    reasoning: Annotated[str, msgspec.Meta(description="Explanation for the selection")]
+
+
+class PlanElementVerification(msgspec.Struct):
+    element: str
+    element_type: Literal["challenge", "factor", "step"]
+    is_addressed: bool
+    confidence: Annotated[float, msgspec.Meta(ge=0, le=1)]
+    explanation: str
+
+
+class OverallAssessment(msgspec.Struct):
+    is_sufficient: bool
+    missing_elements: List[str]
+    recommendations: str
+
+
+class VerifyPlanCoverageArgs(msgspec.Struct):
+    verifications: List[PlanElementVerification]
+    overall_assessment: OverallAssessment
+
+
+class ScenarioPlanArgs(Plan):
+    scenario_index: Annotated[
+        int, msgspec.Meta(description="Index of the scenario this plan is for")
+    ]
+
+
+class CreateTrafficPlansArgs(msgspec.Struct):
+    plans: List[ScenarioPlanArgs]
+
+
+class ScenarioSelectionArgs(msgspec.Struct):
+    scenario_index: Annotated[int, msgspec.Meta(description="Index of the scenario")]
+    selected_index: Annotated[
+        int, msgspec.Meta(description="Index of the best plan for the scenario")
+    ]
+
+
+class SelectPlansArgs(msgspec.Struct):
+    selections: List[ScenarioSelectionArgs]
+
+
+def parameters_schema(args_type: type) -> dict:
+    """Generate the JSON Schema for a function's parameters from its Struct
+
+    msgspec puts every Struct under $defs and references it; the top-level
+    reference is inlined since function parameters must be an object schema.
+    Its title and docstring description are dropped, as the function has its own.
+    """
+    (ref,), components = msgspec.json.schema_components([args_type])
+    schema = dict(components.pop(ref["$ref"].rsplit("/", 1)[-1]))
+    schema.pop("title", None)
+    schema.pop("description", None)
+    if components:
+        schema["$defs"] = components
+    return schema
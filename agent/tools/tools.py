@@ -1,121 +1,104 @@
+import sys
+from functools import lru_cache
+
+import msgspec
+import orjson
+
+from agent.models.models import Plan, SignalTiming
+from agent.tools.schemas import (
+    SelectPlanArgs,
+    VerifyPlanCoverageArgs,
+    CreateTrafficPlansArgs,
+    SelectPlansArgs,
+    parameters_schema,
+)
+
+__all__ = ["TOOL_SCHEMAS_JSON", "VALIDATORS", "get_tool_schema"]
+
+
+def _intern_schema(value):
+    """Recursively intern every string key and value of a schema"""
+    if isinstance(value, dict):
+        return {sys.intern(k): _intern_schema(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_intern_schema(v) for v in value]
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
 create_traffic_plan = {
     "name": "create_traffic_plan",
     "description": "Create a structured traffic analysis plan",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "challenges": {
-                "type": "array",
-                "items": {"type": "string"},
-                "description": "List of 2-4 key challenges",
-            },
-            "factors": {
-                "type": "array",
-                "items": {"type": "string"},
-                "description": "List of 3-5 main factors to analyze",
-            },
-            "steps": {
-                "type": "array",
-                "items": {"type": "string"},
-                "description": "List of 4-6 ordered analysis steps",
-            },
-        },
-        "required": ["challenges", "factors", "steps"],
-    },
+    "parameters": parameters_schema(Plan),
 }
 
 select_best_plan = {
     "name": "select_plan",
     "description": "Select the best plan index",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "selected_index": {
-                "type": "integer",
-                "description": "Index of the best plan (0-2)",
-            },
-            "reasoning": {
-                "type": "string",
-                "description": "Explanation for the selection",
-            },
-        },
-        "required": ["selected_index", "reasoning"],
-    },
+    "parameters": parameters_schema(SelectPlanArgs),
 }
 
 create_signal_timing = {
     "name": "create_signal_timing",
     "description": "Create signal timing recommendations",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "phase_timings": {
-                "type": "object",
-                "description": "Timing in seconds for each phase",
-                "additionalProperties": {"type": "integer"},
-            },
-            "turn_signal_timings": {
-                "type": "object",
-                "description": "Optional timing in seconds for turn signals",
-                "additionalProperties": {"type": "integer"},
-            },
-            "cycle_length": {
-                "type": "integer",
-                "description": "Total cycle length in seconds",
-            },
-            "priority_phases": {
-                "type": "array",
-                "items": {"type": "string"},
-                "description": "List of priority phases",
-            },
-            "reasoning": {
-                "type": "string",
-                "description": "Detailed explanation of timing decisions",
-            },
-        },
-        "required": ["phase_timings", "cycle_length", "priority_phases", "reasoning"],
-    },
+    "parameters": parameters_schema(SignalTiming),
 }
 
 verify_plan_coverage = {
     "name": "verify_plan_coverage",
     "description": "Verify how well the timing recommendations address each plan element",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "verifications": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "element": {"type": "string"},
-                        "element_type": {
-                            "type": "string",
-                            "enum": ["challenge", "factor", "step"],
-                        },
-                        "is_addressed": {"type": "boolean"},
-                        "confidence": {"type": "number", "minimum": 0, "maximum": 1},
-                        "explanation": {"type": "string"},
-                    },
-                    "required": [
-                        "element",
-                        "element_type",
-                        "is_addressed",
-                        "confidence",
-                        "explanation",
-                    ],
-                },
-            },
-            "overall_assessment": {
-                "type": "object",
-                "properties": {
-                    "is_sufficient": {"type": "boolean"},
-                    "missing_elements": {"type": "array", "items": {"type": "string"}},
-                    "recommendations": {"type": "string"},
-                },
-                "required": ["is_sufficient", "missing_elements", "recommendations"],
-            },
-        },
-        "required": ["verifications", "overall_assessment"],
-    },
+    "parameters": parameters_schema(VerifyPlanCoverageArgs),
+}
+
+create_traffic_plans = {
+    "name": "create_traffic_plans",
+    "description": "Create structured traffic analysis plans for several scenarios",
+    "parameters": parameters_schema(CreateTrafficPlansArgs),
 }
+
+select_best_plans = {
+    "name": "select_plans",
+    "description": "Select the best plan index for each scenario",
+    "parameters": parameters_schema(SelectPlansArgs),
+}
+
+# Serialized once at import; get_tool_schema hands out a cached parse of these
+# bytes, so request paths share one dict per tool instead of rebuilding it
+TOOL_SCHEMAS_JSON = {
+    schema["name"]: orjson.dumps(schema)
+    for schema in (
+        create_traffic_plan,
+        select_best_plan,
+        create_signal_timing,
+        verify_plan_coverage,
+        create_traffic_plans,
+        select_best_plans,
+    )
+}
+
+# Compiled once per tool from the same Structs the schemas are generated from,
+# so decoding and validating the function call arguments is a single pass.
+# Models often write whole seconds as floats (45.0), so timings are decoded
+# laxly and coerced to int like the original Pydantic models did.
+VALIDATORS = {
+    name: msgspec.json.Decoder(args_type, strict=strict)
+    for name, args_type, strict in (
+        ("create_traffic_plan", Plan, True),
+        ("select_plan", SelectPlanArgs, True),
+        ("create_signal_timing", SignalTiming, False),
+        ("verify_plan_coverage", VerifyPlanCoverageArgs, True),
+        ("create_traffic_plans", CreateTrafficPlansArgs, True),
+        ("select_plans", SelectPlansArgs, True),
+    )
+}
+
+
+@lru_cache(maxsize=None)
+def get_tool_schema(name: str) -> dict:
+    """Get the function schema for a tool by its function name
+
+    Strings are interned so the repeated schema keywords share one object,
+    letting dict lookups on them succeed on identity.
+    """
+    return _intern_schema(orjson.loads(TOOL_SCHEMAS_JSON[name]))
@@ -4,5 +4,16 @@ setup(
     name="traffic-agent",
     version="0.1",
     packages=find_packages(),
-    install_requires=["openai", "python-dotenv", "pydantic", "pytest", "tenacity"],
+    install_requires=[
+        "openai",
+        "httpx[http2]",
+        "python-dotenv",
+        "msgspec",
+        "tenacity",
+        "orjson",
+    ],
+    extras_require={
+        "cache": ["diskcache"],
+        "test": ["pytest", "pytest-xdist"],
+    },
 )
@@ -1,7 +1,16 @@
 # tests/test_traffic_agent.py
+import asyncio
+import httpx
 import pytest
-from unittest.mock import Mock, patch
+import re
+import tenacity
+from functools import lru_cache
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from agent.core import brain
 from agent.core.brain import (
+    _distinct_plans,
+    _read_selected_index,
     TrafficAgent,
     TrafficScenario,
     Plan,
@@ -9,29 +18,188 @@ from agent.core.brain import (
     PlanningError,
     AnalysisError,
 )
-from pydantic import ValidationError
+import msgspec
+from msgspec import ValidationError
+from agent.core.cache import ResponseCache
+from agent.tools.tools import VALIDATORS
 
 # from pprint import pprint
-import json
+import orjson
 
 
-@pytest.fixture
-def agent():
-    return TrafficAgent()
+def _completion(arguments):
+    """Build a read-only stand-in for a function-calling chat completion"""
+    return SimpleNamespace(
+        choices=[
+            SimpleNamespace(
+                message=SimpleNamespace(
+                    function_call=SimpleNamespace(arguments=arguments)
+                )
+            )
+        ]
+    )
 
 
-@pytest.fixture
-def sample_scenario():
+# Completions are built once at import and shared by every test that needs them
+PLAN_COMPLETION = _completion(
+    '{"challenges": ["test"], "factors": ["test"], "steps": ["test"]}'
+)
+TIMING_ARGUMENTS = {
+    "phase_timings": {"north-south": 60, "east-west": 40},
+    "cycle_length": 100,
+    "priority_phases": ["north-south"],
+    "reasoning": "Given the heavy north-south traffic flow...",
+}
+TIMING_COMPLETION = _completion(orjson.dumps(TIMING_ARGUMENTS).decode())
+VERIFICATION_COMPLETION = _completion(
+    '{"verifications": [], "overall_assessment": {"is_sufficient": true, '
+    '"missing_elements": [], "recommendations": ""}}'
+)
+
+
+class FakeStream:
+    """Async stream of function-call argument chunks, like a streamed completion"""
+
+    def __init__(self, arguments: str, chunk_size: int = 5):
+        self.chunks = [
+            arguments[i : i + chunk_size] for i in range(0, len(arguments), chunk_size)
+        ]
+        self.chunks_read = 0
+        self.close = AsyncMock()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        # A leading chunk without a function call, as the API sends for the role
+        yield SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(function_call=None))]
+        )
+        for chunk in self.chunks:
+            self.chunks_read += 1
+            yield SimpleNamespace(
+                choices=[
+                    SimpleNamespace(
+                        delta=SimpleNamespace(
+                            function_call=SimpleNamespace(arguments=chunk)
+                        )
+                    )
+                ]
+            )
+
+
+_SPECIAL_CONDITIONS = re.compile(r"Special Conditions: (.*)")
+
+
+async def answer_request(**kwargs):
+    """Answer a chat completion request with the canned response for its function
+
+    Timing reasoning echoes the scenario's special conditions, as a model
+    taking them into account would.
+    """
+    name = kwargs["function_call"]["name"]
+    if name == "create_traffic_plan":
+        return PLAN_COMPLETION
+    if name == "create_signal_timing":
+        prompt = kwargs["messages"][-1]["content"]
+        conditions = _SPECIAL_CONDITIONS.search(prompt).group(1)
+        return _completion(
+            orjson.dumps(
+                {**TIMING_ARGUMENTS, "reasoning": f"Accounts for: {conditions}"}
+            ).decode()
+        )
+    if name == "verify_plan_coverage":
+        return VERIFICATION_COMPLETION
+    raise AssertionError(f"Unexpected function call: {name}")
+
+
+def make_plan(tag: str, challenges: int = 2, factors: int = 3, steps: int = 4) -> Plan:
+    """Build a plan with the given number of elements, labelled by tag"""
+    return Plan(
+        challenges=[f"{tag} challenge {i}" for i in range(challenges)],
+        factors=[f"{tag} factor {i}" for i in range(factors)],
+        steps=[f"{tag} step {i}" for i in range(steps)],
+    )
+
+
+@lru_cache(maxsize=64)
+def make_scenario(
+    intersection_type: str,
+    lanes_items: tuple,
+    peak_items: tuple,
+    conditions: tuple,
+    time_of_day: str,
+) -> TrafficScenario:
+    """Build a scenario once per distinct set of fields and share it"""
     return TrafficScenario(
-        intersection_type="4-way",
-        lanes={"north": 2, "south": 2, "east": 1, "west": 1},
-        peak_traffic={"north": 0.8, "south": 0.7, "east": 0.3, "west": 0.3},
-        special_conditions=["school_nearby"],
-        time_of_day="morning_rush",
+        intersection_type=intersection_type,
+        lanes=dict(lanes_items),
+        peak_traffic=dict(peak_items),
+        special_conditions=list(conditions),
+        time_of_day=time_of_day,
     )
 
 
+@pytest.fixture(autouse=True, scope="session")
+def memory_cache():
+    # Keep responses cached for the test run only, not in a developer's disk cache
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("TRAFFIC_AGENT_CACHE", ":memory:")
+        yield
+
+
+@pytest.fixture(scope="session")
+def openai_client():
+    """Fake async OpenAI client shared by the whole run"""
+    client = Mock()
+    client.chat.completions.create = AsyncMock()
+    return client
+
+
+@pytest.fixture(autouse=True, scope="session")
+def api_key():
+    # Requests go to a fake client, but the agent still requires a key
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(brain, "_API_KEY", "test-key")
+        yield
+
+
+@pytest.fixture(scope="session")
+def agent(memory_cache, api_key, openai_client):
+    agent = TrafficAgent()
+    agent.async_client = openai_client
+    return agent
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(agent, openai_client):
+    # Every test starts from the default answers, an empty response cache and
+    # no background verifications left over from an earlier test
+    create = openai_client.chat.completions.create
+    create.reset_mock(return_value=True, side_effect=True)
+    create.side_effect = answer_request
+    agent._cache = ResponseCache()
+    agent._pending_verifications = []
+
+
 @pytest.fixture
+def no_retry_wait(monkeypatch):
+    # Retries of invalid model output follow each other without backoff
+    monkeypatch.setattr(tenacity.wait_exponential, "__call__", lambda *args: 0)
+
+
+@pytest.fixture(scope="session")
+def sample_scenario():
+    return make_scenario(
+        "4-way",
+        (("north", 2), ("south", 2), ("east", 1), ("west", 1)),
+        (("north", 0.8), ("south", 0.7), ("east", 0.3), ("west", 0.3)),
+        ("school_nearby",),
+        "morning_rush",
+    )
+
+
+@pytest.fixture(scope="session")
 def sample_plan():
     return Plan(
         challenges=[
@@ -71,62 +239,512 @@ class TestUnitComponents:
         assert "4-way" in formatted
         assert "school_nearby" in formatted
 
+    def test_timing_arguments_accept_whole_float_seconds(self):
+        """Test that timings written as floats are coerced to int seconds"""
+        timing = VALIDATORS["create_signal_timing"].decode(
+            '{"phase_timings": {"north-south": 45.0, "east-west": 30}, '
+            '"cycle_length": 75.0, "priority_phases": [], "reasoning": "r"}'
+        )
+        assert timing.phase_timings == {"north-south": 45, "east-west": 30}
+        assert timing.cycle_length == 75
+        with pytest.raises(ValidationError):
+            VALIDATORS["create_signal_timing"].decode(
+                '{"phase_timings": {"north-south": 45.5}, "cycle_length": 75, '
+                '"priority_phases": [], "reasoning": "r"}'
+            )
+
+
+class TestResponseCache:
+    def test_key_is_stable_across_dict_order(self, sample_scenario):
+        """Test that equal content gives equal keys, whatever the dict order"""
+        reordered = msgspec.structs.replace(
+            sample_scenario, lanes=dict(reversed(sample_scenario.lanes.items()))
+        )
+        key = ResponseCache.key("plan", sample_scenario, 0)
+        assert key == ResponseCache.key("plan", reordered, 0)
+        assert key != ResponseCache.key("plan", sample_scenario, 1)
+        assert key != ResponseCache.key("analysis", sample_scenario, 0)
+
+    def test_hit_and_miss(self):
+        """Test that stored entries are returned and unknown keys miss"""
+        cache = ResponseCache(":memory:")
+        assert cache.get("plan:a") is None
+        cache.set("plan:a", "value")
+        assert cache.get("plan:a") == "value"
+
+    def test_evicts_least_recently_used(self):
+        """Test that the in-memory cache stays bounded to maxsize entries"""
+        cache = ResponseCache(":memory:", maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+
+class TestDistinctPlans:
+    def test_drops_duplicates_in_any_order(self):
+        """Test that plans with the same elements in another order are dropped"""
+        plan = make_plan("a")
+        shuffled = Plan(
+            challenges=plan.challenges[::-1],
+            factors=plan.factors[::-1],
+            steps=plan.steps[::-1],
+        )
+        other = make_plan("b")
+        assert _distinct_plans([plan, shuffled, other]) == [plan, other]
+
+    def test_drops_plans_outside_size_limits(self):
+        """Test that plans outside the prompt's size limits are filtered out"""
+        plan = make_plan("a")
+        too_few_steps = make_plan("b", steps=3)
+        too_many_challenges = make_plan("c", challenges=5)
+        assert _distinct_plans([too_few_steps, plan, too_many_challenges]) == [plan]
+
+    def test_keeps_out_of_spec_plans_when_none_fit(self):
+        """Test that out-of-spec plans are still deduplicated when none fit"""
+        short = make_plan("a", steps=1)
+        other = make_plan("b", steps=1)
+        assert _distinct_plans([short, short, other]) == [short, other]
+
+    def test_single_distinct_plan_skips_selection(
+        self, openai_client, agent, sample_scenario
+    ):
+        """Test that no selection request is made when one plan remains"""
+        plans = [make_plan("a")] * 3
+        plan = agent._run(agent._pick_plan_async(plans, sample_scenario))
+        assert plan is plans[0]
+        openai_client.chat.completions.create.assert_not_awaited()
+
+    def test_selection_labels_remaining_plans_from_zero(
+        self, openai_client, agent, sample_scenario
+    ):
+        """Test that the index of a deduplicated pair matches the prompt labels"""
+        a, b = make_plan("a"), make_plan("b")
+        create = openai_client.chat.completions.create
+        create.side_effect = [FakeStream('{"selected_index": 1, "reasoning": "r"}')]
+
+        plan = agent._run(agent._pick_plan_async([a, a, b], sample_scenario))
+
+        assert plan is b
+        prompt = create.await_args.kwargs["messages"][-1]["content"]
+        assert "Plan 0:" in prompt and "Plan 1:" in prompt
+        assert "Plan 2:" not in prompt and "three plans" not in prompt
+
+
+def make_timing(north_south: int, east_west: int, cycle_length: int = 0):
+    """Build a two-phase timing, cycling through both phases by default"""
+    return SignalTiming(
+        phase_timings={"north-south": north_south, "east-west": east_west},
+        cycle_length=cycle_length or north_south + east_west,
+        priority_phases=[],
+        reasoning="",
+    )
+
+
+class TestTimingValidation:
+    @staticmethod
+    def scenario(intersection_type: str) -> TrafficScenario:
+        return make_scenario(
+            intersection_type,
+            (("north", 1), ("east", 1)),
+            (("north", 0.5), ("east", 0.5)),
+            (),
+            "midday",
+        )
+
+    def test_minimum_green_follows_intersection_type(self, agent):
+        """Test that the minimum green comes from the knowledge base per type"""
+        with pytest.raises(AnalysisError, match=r"minimum safe time \(30 seconds\)"):
+            agent._validate_timing(make_timing(20, 50), self.scenario("4-way"))
+        with pytest.raises(AnalysisError, match=r"minimum safe time \(30 seconds\)"):
+            agent._validate_timing(make_timing(27, 50), self.scenario("4-way"))
+        agent._validate_timing(make_timing(27, 50), self.scenario("3-way"))
+        with pytest.raises(AnalysisError, match=r"minimum safe time \(25 seconds\)"):
+            agent._validate_timing(make_timing(20, 50), self.scenario("3-way"))
+
+    def test_cycle_length_must_match_phase_sum(self, agent):
+        """Test that a cycle length differing from the phase sum is rejected"""
+        with pytest.raises(AnalysisError, match="doesn't match sum"):
+            agent._validate_timing(make_timing(40, 40, 90), self.scenario("4-way"))
+
+    @pytest.mark.parametrize("north_south, east_west", [(28, 30), (100, 90)])
+    def test_cycle_length_bounds(self, agent, north_south, east_west):
+        """Test that cycles outside 60-180 seconds are rejected"""
+        with pytest.raises(AnalysisError, match="outside acceptable range"):
+            agent._validate_timing(
+                make_timing(north_south, east_west), self.scenario("3-way")
+            )
+
+
+class TestSelectionStream:
+    def test_stops_reading_once_index_arrives(self, agent):
+        """Test that the index is read across chunks and the stream closed early"""
+        stream = FakeStream('{"selected_index": 1, "reasoning": "' + "x" * 200 + '"}')
+        assert agent._run(_read_selected_index(stream)) == 1
+        assert stream.chunks_read < len(stream.chunks)
+        stream.close.assert_awaited_once()
+
+    def test_decodes_arguments_the_pattern_misses(self, agent):
+        """Test that arguments the pattern cannot match are decoded in full"""
+        stream = FakeStream('{"reasoning": "x", "selected\\u005findex": 2}')
+        assert agent._run(_read_selected_index(stream)) == 2
+        assert stream.chunks_read == len(stream.chunks)
+        stream.close.assert_awaited_once()
+
+    def test_closes_stream_on_invalid_arguments(self, agent):
+        """Test that the stream is closed when the arguments cannot be decoded"""
+        stream = FakeStream('{"reasoning": "x"')
+        with pytest.raises(msgspec.DecodeError):
+            agent._run(_read_selected_index(stream))
+        stream.close.assert_awaited_once()
+
+
+class TestClientLifecycle:
+    def test_missing_api_key_fails_construction(self, monkeypatch):
+        """Test that a missing API key is reported when the agent is built"""
+        from openai import OpenAIError
+
+        monkeypatch.setattr(brain, "_API_KEY", None)
+        with pytest.raises(OpenAIError, match="OPENAI_API_KEY"):
+            TrafficAgent()
+
+    def test_each_loops_client_is_closed_with_the_agent(self, monkeypatch):
+        """Test that the client opened on each event loop is closed by aclose"""
+        monkeypatch.setattr(brain, "_new_async_client", lambda: Mock(close=AsyncMock()))
+        traffic_agent = TrafficAgent()
+
+        async def request():
+            async with traffic_agent:
+                return traffic_agent.async_client
+
+        clients = [asyncio.run(request()) for _ in range(2)]
+
+        assert clients[0] is not clients[1]
+        for client in clients:
+            client.close.assert_awaited_once()
+        assert traffic_agent._async_clients == {}
+
+    def test_clients_of_closed_loops_are_dropped(self, monkeypatch):
+        """Test that a client left open on a closed loop is not kept alive"""
+        monkeypatch.setattr(brain, "_new_async_client", lambda: Mock(close=AsyncMock()))
+        traffic_agent = TrafficAgent()
+
+        async def request():
+            return traffic_agent.async_client
+
+        first = asyncio.run(request())
+        second = asyncio.run(request())
+
+        assert list(traffic_agent._async_clients.values()) == [second]
+        first.close.assert_not_awaited()
+
+
+class TestWarmup:
+    def test_warmup_makes_one_request(self, monkeypatch):
+        """Test that the warmup lists the models once and closes its client"""
+        client = Mock(close=AsyncMock())
+        client.models.list = AsyncMock()
+        monkeypatch.setattr(brain, "_new_async_client", lambda: client)
+
+        brain._warmup()
+
+        client.models.list.assert_awaited_once()
+        client.close.assert_awaited_once()
+
+    def test_failed_warmup_only_logs_a_warning(self, monkeypatch, caplog):
+        """Test that a failing warmup request does not break the import"""
+        client = Mock(close=AsyncMock())
+        client.models.list = AsyncMock(side_effect=ConnectionError("offline"))
+        monkeypatch.setattr(brain, "_new_async_client", lambda: client)
+
+        brain._warmup()
+
+        assert "warmup request failed: offline" in caplog.text
+        assert caplog.records[-1].levelname == "WARNING"
+
 
 # Integration Tests
 class TestIntegration:
-    @patch("openai.OpenAI")
-    def test_plan_creation_integration(self, mock_openai, agent, sample_scenario):
+    def test_plan_creation_integration(self, openai_client, agent, sample_scenario):
         """Test plan creation with mocked OpenAI response"""
-        mock_completion = Mock()
-        mock_completion.choices = [
-            Mock(
-                message=Mock(
-                    function_call=Mock(
-                        arguments='{"challenges": ["test"], "factors": ["test"], "steps": ["test"]}'
-                    )
-                )
-            )
-        ]
-        mock_openai.return_value.chat.completions.create.return_value = mock_completion
+        openai_client.chat.completions.create.side_effect = [PLAN_COMPLETION] * 3
 
         plan = agent._create_plan(sample_scenario)
         assert isinstance(plan, Plan)
+        assert openai_client.chat.completions.create.await_count == 3
 
-    @patch("agent.core.brain.OpenAI")  # or whatever path we're using
     def test_analysis_integration(
-        self, mock_openai, agent, sample_scenario, sample_plan
+        self, openai_client, agent, sample_scenario, sample_plan
     ):
-        print("\nDEBUG: Patch applied, mock_openai:", mock_openai)
-        # Create a mock completion object
-        mock_completion = Mock()
-        mock_completion.choices = [
-            Mock(
-                message=Mock(
-                    function_call=Mock(
-                        arguments=json.dumps(
-                            {
-                                "phase_timings": {"north-south": 60, "east-west": 40},
-                                "cycle_length": 100,
-                                "priority_phases": ["north-south"],
-                                "reasoning": "Given the heavy north-south traffic flow...",
-                            }
-                        )
-                    )
-                )
-            )
+        # Configure the mock OpenAI client for the timing and its verification
+        openai_client.chat.completions.create.side_effect = [
+            TIMING_COMPLETION,
+            VERIFICATION_COMPLETION,
         ]
 
-        # Configure the mock OpenAI client
-        mock_client = Mock()
-        mock_client.chat.completions.create.return_value = mock_completion
-        mock_openai.return_value = mock_client
-
-        # Now when your code calls OpenAI, it will use this mock
         timing = agent.analyze_with_plan(sample_scenario, sample_plan)
 
         assert isinstance(timing, SignalTiming)
         assert timing.cycle_length == 100
         assert timing.phase_timings["north-south"] == 60
+        timing_call = openai_client.chat.completions.create.await_args_list[0]
+        assert timing_call.kwargs["function_call"] == {"name": "create_signal_timing"}
+
+
+class TestRetries:
+    def test_exhausted_plan_retries_raise_planning_error(
+        self, openai_client, agent, sample_scenario, no_retry_wait
+    ):
+        """Test that the last output error surfaces once retries run out"""
+        create = openai_client.chat.completions.create
+        create.side_effect = None
+        create.return_value = _completion('{"challenges": ["test"]')
+
+        with pytest.raises(PlanningError, match="Failed to parse"):
+            agent._run(agent._create_single_plan_async(sample_scenario))
+        assert create.await_count == 3
+
+    def test_exhausted_analysis_retries_raise_analysis_error(
+        self, openai_client, agent, sample_scenario, sample_plan, no_retry_wait
+    ):
+        """Test that invalid timings surface as AnalysisError after the retries"""
+        create = openai_client.chat.completions.create
+        create.side_effect = None
+        create.return_value = _completion(
+            orjson.dumps({**TIMING_ARGUMENTS, "cycle_length": 90}).decode()
+        )
+
+        with pytest.raises(AnalysisError, match="doesn't match sum"):
+            agent.analyze_with_plan(sample_scenario, sample_plan)
+        assert create.await_count == 3
+
+    def test_api_error_is_neither_wrapped_nor_retried(
+        self, openai_client, agent, sample_scenario
+    ):
+        """Test that API failures are left to the OpenAI client's own retries"""
+        from openai import APIError
+
+        error = APIError(
+            "Service unavailable",
+            httpx.Request("POST", "https://api.openai.com/v1/chat/completions"),
+            body=None,
+        )
+        create = openai_client.chat.completions.create
+        create.side_effect = error
+
+        with pytest.raises(APIError) as raised:
+            agent._run(agent._create_single_plan_async(sample_scenario))
+        assert raised.value is error
+        assert create.await_count == 1
+
+
+class TestSpeculativeAnalysis:
+    plans = [make_plan(tag) for tag in "abc"]
+
+    def script(self, openai_client, selected_index):
+        """Answer with three distinct plans, then select the one at selected_index
+
+        Plans arrive in order, a first, and the others only once the timing
+        request for a is out. Returns the plans each timing request was made
+        for and the ones whose request was cancelled. The selected plan's
+        timing request is held until the selection has been made, and any
+        other plan's until it is cancelled, so the speculative request is
+        still in flight when the selection arrives.
+        """
+        plan_order = iter(range(len(self.plans)))
+        arrived = [asyncio.Event() for _ in self.plans]
+        speculating = asyncio.Event()
+        selected = asyncio.Event()
+        analyzed, cancelled = [], []
+
+        async def create(**kwargs):
+            name = kwargs["function_call"]["name"]
+            if name == "create_traffic_plan":
+                i = next(plan_order)
+                if i:
+                    await (arrived[i - 1] if i > 1 else speculating).wait()
+                arrived[i].set()
+                return _completion(self.plans[i].compact_json)
+            if name == "select_plan":
+                selected.set()
+                return FakeStream(f'{{"selected_index": {selected_index}}}')
+            if name == "create_signal_timing":
+                prompt = kwargs["messages"][-1]["content"]
+                plan = next(p for p in self.plans if p.compact_json in prompt)
+                analyzed.append(plan)
+                speculating.set()
+                try:
+                    if plan is self.plans[selected_index]:
+                        await selected.wait()
+                    else:
+                        await asyncio.Event().wait()
+                except asyncio.CancelledError:
+                    cancelled.append(plan)
+                    raise
+                return TIMING_COMPLETION
+            return VERIFICATION_COMPLETION
+
+        openai_client.chat.completions.create.side_effect = create
+        return analyzed, cancelled
+
+    def test_selected_speculative_plan_is_analyzed_once(
+        self, openai_client, agent, sample_scenario
+    ):
+        """Test that picking the first plan to arrive reuses its analysis"""
+        analyzed, cancelled = self.script(openai_client, selected_index=0)
+
+        timing = agent.analyze_scenario(sample_scenario)
+
+        assert timing.cycle_length == 100
+        assert analyzed == [self.plans[0]]
+        assert cancelled == []
+
+    def test_other_selected_plan_cancels_speculation(
+        self, openai_client, agent, sample_scenario
+    ):
+        """Test that picking another plan cancels and re-issues the analysis"""
+        analyzed, cancelled = self.script(openai_client, selected_index=2)
+
+        timing = agent.analyze_scenario(sample_scenario)
+
+        assert timing.cycle_length == 100
+        assert analyzed == [self.plans[0], self.plans[2]]
+        assert cancelled == [self.plans[0]]
+
+
+def batch_plans_completion(*entries):
+    """Build a create_traffic_plans completion from (scenario_index, plan) pairs"""
+    return _completion(
+        msgspec.json.encode(
+            {
+                "plans": [
+                    {**msgspec.structs.asdict(plan), "scenario_index": index}
+                    for index, plan in entries
+                ]
+            }
+        ).decode()
+    )
+
+
+class TestBatchAnalysis:
+    def test_groups_plans_by_scenario_index(
+        self, openai_client, agent, sample_scenario
+    ):
+        """Test that batch plans are grouped per scenario, skipping bad indices"""
+        a, b, c = make_plan("a"), make_plan("b"), make_plan("c")
+        openai_client.chat.completions.create.side_effect = [
+            batch_plans_completion((1, a), (0, b), (5, c), (1, c), (-1, a))
+        ]
+        other = msgspec.structs.replace(sample_scenario, time_of_day="midday")
+
+        plans = agent._run(agent._create_plans_batch_async([sample_scenario, other]))
+
+        assert plans == [[b], [a, c]]
+
+    @pytest.mark.parametrize(
+        "arguments",
+        [
+            '{"plans": [{"scenario_index": 0}]}',
+            '{"plans": [{"scenario_index": 0, "challe',
+        ],
+        ids=["invalid", "truncated"],
+    )
+    def test_invalid_batch_falls_back_per_scenario(
+        self, openai_client, agent, sample_scenario, arguments
+    ):
+        """Test that scenarios are planned one by one when the batch is unusable"""
+        create = openai_client.chat.completions.create
+
+        async def answer(**kwargs):
+            if kwargs["function_call"]["name"] == "create_traffic_plans":
+                return _completion(arguments)
+            return await answer_request(**kwargs)
+
+        create.side_effect = answer
+        other = msgspec.structs.replace(sample_scenario, time_of_day="midday")
+
+        timings = agent.analyze_scenarios([sample_scenario, other])
+
+        assert [timing.cycle_length for timing in timings] == [100, 100]
+        names = [
+            call.kwargs["function_call"]["name"] for call in create.await_args_list
+        ]
+        assert names.count("create_traffic_plans") == 1
+        assert names.count("create_traffic_plan") == 6
+        assert "select_plans" not in names
+
+    def test_failed_analysis_falls_back_per_scenario(
+        self, openai_client, agent, sample_scenario, monkeypatch, no_retry_wait
+    ):
+        """Test that one scenario's failed analysis keeps the other timings"""
+        other = msgspec.structs.replace(sample_scenario, time_of_day="midday")
+        fallback = make_timing(45, 45)
+        monkeypatch.setattr(agent, "_fallback_analysis", lambda scenario: fallback)
+
+        async def answer(**kwargs):
+            name = kwargs["function_call"]["name"]
+            if name == "create_traffic_plans":
+                return batch_plans_completion((0, make_plan("a")), (1, make_plan("b")))
+            if name == "create_signal_timing":
+                if "midday" in kwargs["messages"][-1]["content"]:
+                    return _completion('{"phase_timings": {"north-south"')
+            return await answer_request(**kwargs)
+
+        openai_client.chat.completions.create.side_effect = answer
+
+        timings = agent.analyze_scenarios([sample_scenario, other])
+
+        assert timings[0].cycle_length == 100
+        assert timings[1] is fallback
+
+    def test_no_scenarios_makes_no_requests(self, openai_client, agent):
+        """Test that an empty batch returns at once without calling the API"""
+        assert agent.analyze_scenarios([]) == []
+        openai_client.chat.completions.create.assert_not_awaited()
+
+
+class TestBackgroundVerification:
+    def test_failed_verification_surfaces_on_drain(
+        self, openai_client, agent, sample_scenario, sample_plan
+    ):
+        """Test that a failed background verification is raised and not cached"""
+        create = openai_client.chat.completions.create
+        create.side_effect = [
+            TIMING_COMPLETION,
+            _completion(
+                '{"verifications": [], "overall_assessment": {"is_sufficient": false, '
+                '"missing_elements": ["school zone"], "recommendations": "r"}}'
+            ),
+        ]
+
+        timing = agent.analyze_with_plan(sample_scenario, sample_plan, strict=False)
+        assert timing.cycle_length == 100
+        assert len(agent._pending_verifications) == 1
+
+        with pytest.raises(AnalysisError, match="school zone"):
+            agent.drain_verifications()
+        assert create.await_count == 2
+
+        # The unverified timing was not cached, so analysis is requested again
+        create.side_effect = [TIMING_COMPLETION, VERIFICATION_COMPLETION]
+        agent.analyze_with_plan(sample_scenario, sample_plan)
+        assert create.await_count == 4
+
+    def test_verified_timing_is_cached_after_drain(
+        self, openai_client, agent, sample_scenario, sample_plan
+    ):
+        """Test that a timing verified in the background is cached once drained"""
+        create = openai_client.chat.completions.create
+        create.side_effect = [TIMING_COMPLETION, VERIFICATION_COMPLETION]
+
+        timing = agent.analyze_with_plan(sample_scenario, sample_plan, strict=False)
+        agent.drain_verifications()
+
+        assert agent.analyze_with_plan(sample_scenario, sample_plan) == timing
+        assert create.await_count == 2
 
 
 # End-to-End Tests
@@ -168,19 +786,20 @@ class TestEdgeCases:
     )
     def test_various_conditions(self, agent, sample_scenario, special_condition):
         """Test handling of different special conditions"""
-        scenario = sample_scenario.copy()
-        scenario.special_conditions = special_condition
+        scenario = msgspec.structs.replace(
+            sample_scenario, special_conditions=special_condition
+        )
         timing = agent.analyze_scenario(scenario)
         assert special_condition[0] in timing.reasoning.lower()
 
     def test_high_traffic_scenario(self, agent):
         """Test handling of extreme traffic conditions"""
-        scenario = TrafficScenario(
-            intersection_type="4-way",
-            lanes={"north": 3, "south": 3, "east": 3, "west": 3},
-            peak_traffic={"north": 0.95, "south": 0.95, "east": 0.95, "west": 0.95},
-            special_conditions=[],
-            time_of_day="peak_rush",
+        scenario = make_scenario(
+            "4-way",
+            (("north", 3), ("south", 3), ("east", 3), ("west", 3)),
+            (("north", 0.95), ("south", 0.95), ("east", 0.95), ("west", 0.95)),
+            (),
+            "peak_rush",
         )
         timing = agent.analyze_scenario(scenario)
         assert timing.cycle_length >= 90  # Expect longer cycle for heavy traffic